@@ -6,17 +6,23 @@ with open("README.md") as f:
     long_description = f.read()
 
 inst_reqs = [
+    "cachetools",
     "fastapi",
     "jinja2",
+    "msgpack",
+    "orjson",
     "python-binary-memcached",
     "rio-color",
     "rio-tiler-crs~=2.0",
     "email-validator",
+    "xxhash>=2.0",
+    "zstandard",
 ]
 extra_reqs = {
     "dev": ["pytest", "pytest-cov", "pytest-asyncio", "pre-commit"],
     "server": ["uvicorn", "click==7.0"],
     "lambda": ["mangum>=0.9.0"],
+    "numba": ["numba"],
     "deploy": [
         "docker",
         "aws-cdk.core",
@@ -27,7 +33,7 @@ extra_reqs = {
         "aws-cdk.aws_autoscaling",
         "aws-cdk.aws_ecs_patterns",
     ],
-    "test": ["mock", "pytest", "pytest-cov", "pytest-asyncio", "requests"],
+    "test": ["mock", "pytest", "pytest-cov", "pytest-asyncio", "requests", "numba"],
 }
 
 
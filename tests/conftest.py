@@ -8,17 +8,24 @@ from starlette.testclient import TestClient
 from rio_tiler_crs import COGReader
 
 
-@pytest.fixture(autouse=True)
-def app(monkeypatch) -> TestClient:
-    """Make sure we use monkeypatch env."""
-    monkeypatch.setenv("DISABLE_CACHE", "YESPLEASE")
-    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "jqt")
-    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "rde")
-    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-west-2")
-    monkeypatch.setenv("AWS_REGION", "us-west-2")
-    monkeypatch.delenv("AWS_PROFILE", raising=False)
-    monkeypatch.setenv("AWS_CONFIG_FILE", "/tmp/noconfigheere")
-
+def pytest_configure(config):
+    """Set test environment once, before titiler settings are read."""
+    os.environ.update(
+        {
+            "DISABLE_CACHE": "YESPLEASE",
+            "AWS_ACCESS_KEY_ID": "jqt",
+            "AWS_SECRET_ACCESS_KEY": "rde",
+            "AWS_DEFAULT_REGION": "us-west-2",
+            "AWS_REGION": "us-west-2",
+            "AWS_CONFIG_FILE": "/tmp/noconfigheere",
+        }
+    )
+    os.environ.pop("AWS_PROFILE", None)
+
+
+@pytest.fixture(scope="session")
+def app() -> TestClient:
+    """Create one test client for the whole session."""
     from titiler.main import app
 
     return TestClient(app)
@@ -30,3 +37,19 @@ def mock_reader(src_path: str, *args, **kwargs) -> COGReader:
     assert src_path.startswith("https://myurl.com/")
     cog_path = os.path.basename(src_path)
     return COGReader(os.path.join(prefix, cog_path), *args, **kwargs)
+
+
+class FakeMemcacheClient(dict):
+    """In-memory memcached client."""
+
+    def __init__(self, *args, **kwargs):
+        """Init client."""
+        super().__init__()
+
+    def set(self, key, value, time=0):
+        """Set value."""
+        self[key] = value
+        return True
+
+    def disconnect_all(self):
+        """Nothing to disconnect."""
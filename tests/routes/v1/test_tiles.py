@@ -8,8 +8,14 @@ from unittest.mock import patch
 import numpy
 
 from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
 
-from ...conftest import mock_reader
+from titiler.api import utils
+from titiler.api.api_v1.endpoints import tiles
+
+from titiler.db.memcache import CacheLayer
+
+from ...conftest import FakeMemcacheClient, mock_reader
 
 
 def parse_img(content: bytes) -> Dict:
@@ -22,6 +28,7 @@ def parse_img(content: bytes) -> Dict:
 def test_tile(reader, app):
     """test tile endpoints."""
     reader.side_effect = mock_reader
+    tiles._cog_pool.clear()
 
     # full tile
     response = app.get(
@@ -29,6 +36,7 @@ def test_tile(reader, app):
     )
     assert response.status_code == 200
     assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["X-Server-Timings"].startswith("Read - ")
     meta = parse_img(response.content)
     assert meta["width"] == 256
     assert meta["height"] == 256
@@ -64,15 +72,19 @@ def test_tile(reader, app):
     assert meta["count"] == 2
     assert meta["width"] == 512
     assert meta["height"] == 512
+    bounds = utils.get_tms("WebMercatorQuad").xy_bounds(87, 48, 8)
+    assert meta["transform"].almost_equals(from_bounds(*bounds, 512, 512))
 
     response = app.get(
         "/v1/cog/tiles/8/87/48.npy?url=https://myurl.com/cog.tif&nodata=0"
     )
     assert response.status_code == 200
     assert response.headers["content-type"] == "application/x-binary"
-    t, m = numpy.load(BytesIO(response.content), allow_pickle=True)
-    assert t.shape == (1, 256, 256)
-    assert m.shape == (256, 256)
+    data = numpy.load(BytesIO(response.content))
+    assert data.shape == (2, 256, 256)
+    assert data.dtype == "uint16"
+    # last band is the mask
+    assert numpy.isin(data[-1], [0, 255]).all()
 
     # partial
     response = app.get(
@@ -93,14 +105,92 @@ def test_tile(reader, app):
     assert response.status_code == 200
     assert response.headers["content-type"] == "image/png"
 
+    # COGs are opened once and kept in the pool
+    assert reader.call_count == 2
+    assert len(tiles._cog_pool) == 2
+    tiles._cog_pool.clear()
+    assert len(tiles._cog_pool) == 0
+
+
+@patch("titiler.api.api_v1.endpoints.tiles.COGReader")
+def test_interior_tile(reader):
+    """Should only skip the mask scan for tiles inside a COG without nodata."""
+    reader.side_effect = mock_reader
+    tms = utils.get_tms("WebMercatorQuad")
+
+    url = "https://myurl.com/cog.tif"
+    entry = tiles._cog_pool.checkout(url, tms)
+    tiles._cog_pool.checkin(url, tms, entry)
+    opaque_bounds = entry[3]
+    assert opaque_bounds
+
+    x, y, z = 87, 48, 8
+    assert tiles._is_interior_tile(opaque_bounds, tms, x, y, z)
+    bounds = tms.xy_bounds(x, y, z)
+    xmin, ymin, xmax, ymax = opaque_bounds
+    assert xmin <= bounds.xmin and bounds.xmax <= xmax
+    assert ymin <= bounds.ymin and bounds.ymax <= ymax
+    tile, mask, _, full_mask = tiles._read_tile(url, tms, x, y, z)
+    assert full_mask and mask.all()
+
+    # tiles crossing the COG edges are scanned
+    assert not tiles._is_interior_tile(opaque_bounds, tms, 84, 47, 8)
+    tile, mask, _, full_mask = tiles._read_tile(url, tms, 84, 47, 8)
+    assert not full_mask and not mask.all()
+    assert not tiles._is_interior_tile(None, tms, x, y, z)
+
+    # COG with nodata
+    url = "https://myurl.com/above_cog.tif"
+    entry = tiles._cog_pool.checkout(url, tms)
+    tiles._cog_pool.checkin(url, tms, entry)
+    assert entry[3] is None
+    tiles._cog_pool.clear()
+
+
+@patch("titiler.api.api_v1.endpoints.tiles.COGReader")
+def test_reader_pool(reader):
+    """Should open one reader per concurrent use and close only idle ones."""
+    reader.side_effect = mock_reader
+    tms = utils.get_tms("WebMercatorQuad")
+    url = "https://myurl.com/cog.tif"
+    pool = tiles._ReaderPool(maxsize=1, ttl=300)
+
+    first = pool.checkout(url, tms)
+    second = pool.checkout(url, tms)
+    assert first[0] is not second[0]
+    assert reader.call_count == 2
+
+    pool.checkin(url, tms, first)
+    pool.checkin(url, tms, second)
+    assert len(pool) == 1
+    assert first[0].dataset.closed
+    assert not second[0].dataset.closed
+
+    assert pool.checkout(url, tms) is second
+    pool.checkin(url, tms, second)
+    pool.clear()
+    assert len(pool) == 0
+    assert second[0].dataset.closed
+
+    # expired readers are closed instead of being kept
+    pool = tiles._ReaderPool(maxsize=1, ttl=0)
+    entry = pool.checkout(url, tms)
+    pool.checkin(url, tms, entry)
+    assert len(pool) == 0
+    assert entry[0].dataset.closed
+
 
 @patch("titiler.api.api_v1.endpoints.tiles.COGReader")
 def test_tilejson(reader, app):
     """test /tilejson endpoint."""
     reader.side_effect = mock_reader
+    utils.cog_metadata_cache.clear()
+    utils.tilejson_cache.clear()
 
     response = app.get("/v1/cog/tilejson.json?url=https://myurl.com/cog.tif")
     assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["cache-control"] == "max-age=3600"
     body = response.json()
     assert body["tilejson"] == "2.2.0"
     assert body["version"] == "1.0.0"
@@ -113,6 +203,7 @@ def test_tilejson(reader, app):
     assert body["maxzoom"] == 8
     assert body["bounds"]
     assert body["center"]
+    assert body["name"] == "cog.tif"
 
     response = app.get(
         "/v1/cog/tilejson.json?url=https://myurl.com/cog.tif&tile_format=png&tile_scale=2"
@@ -123,6 +214,27 @@ def test_tilejson(reader, app):
         "http://testserver/v1/cog/tiles/WebMercatorQuad/{z}/{x}/{y}@2x.png?url=https"
     )
 
+    response = app.get(
+        "/v1/cog/tilejson.json?url=https://myurl.com/cog.tif&color_formula=Gamma R 3&bidx=1&bidx=2"
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["tiles"][0].endswith(
+        "?url=https://myurl.com/cog.tif&color_formula=Gamma+R+3&bidx=1&bidx=2"
+    )
+
+    response = app.get(
+        "/v1/cog/tilejson.json?url=https://myurl.com/cog.tif&expression=b1%3Bb2%2B1"
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["tiles"][0].endswith(
+        "?url=https://myurl.com/cog.tif&expression=b1%3Bb2%2B1"
+    )
+
+    # COG metadata are cached
+    assert reader.call_count == 1
+
 
 def test_tilematrix(app):
     """test /tileMatrixSet endpoint."""
@@ -141,3 +253,47 @@ def test_tilematrixInfo(app):
     body = response.json()
     assert body["type"] == "TileMatrixSetType"
     assert body["identifier"] == "EPSG3413"
+
+
+@patch("titiler.api.api_v1.endpoints.tiles.COGReader")
+def test_tile_no_timings(reader, app, monkeypatch):
+    """Should not add X-Server-Timings header when disabled."""
+    reader.side_effect = mock_reader
+    monkeypatch.setattr(tiles.config, "TIMINGS_ENABLED", False)
+    monkeypatch.setattr(tiles, "_timer", utils.NullTimer)
+
+    response = app.get(
+        "/v1/cog/tiles/8/87/48?url=https://myurl.com/cog.tif&rescale=0,1000"
+    )
+    assert response.status_code == 200
+    assert "X-Server-Timings" not in response.headers
+
+
+@patch("titiler.db.memcache.Client", FakeMemcacheClient)
+@patch("titiler.api.api_v1.endpoints.tiles.COGReader")
+def test_tile_cache(reader, app, monkeypatch):
+    """Should use encoded and raw data cache layers."""
+    from titiler import main
+
+    reader.side_effect = mock_reader
+    tiles._cog_pool.clear()
+    monkeypatch.setattr(main, "cache", CacheLayer("localhost"))
+
+    endpoint = "/v1/cog/tiles/8/87/48?url=https://myurl.com/cog.tif"
+    response = app.get(f"{endpoint}&rescale=0,1000")
+    assert response.status_code == 200
+    assert "X-Cache" not in response.headers
+    assert reader.call_count == 1
+
+    response = app.get(f"{endpoint}&rescale=0,1000")
+    assert response.status_code == 200
+    assert response.headers["X-Cache"] == "HIT"
+    assert response.headers["content-type"] == "image/jpeg"
+
+    # raw data are re-used for other post-processing options
+    tiles._cog_pool.clear()
+    response = app.get(f"{endpoint}&rescale=0,2000")
+    assert response.status_code == 200
+    assert "X-Cache" not in response.headers
+    assert response.headers["content-type"] == "image/jpeg"
+    assert reader.call_count == 1
@@ -0,0 +1,28 @@
+"""Test titiler.db.memcache."""
+
+from unittest.mock import patch
+
+import numpy
+
+from titiler.db.memcache import CacheLayer
+
+from .conftest import FakeMemcacheClient
+
+
+@patch("titiler.db.memcache.Client", FakeMemcacheClient)
+def test_data_cache():
+    """Should round-trip raw tile data."""
+    cache = CacheLayer("localhost")
+
+    tile = numpy.random.randint(0, 4000, size=(2, 256, 256)).astype(numpy.uint16)
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+    mask[0:10] = 0
+    assert cache.set_data_cache("hash", (tile, mask, {1: (0, 0, 0, 255)}))
+    assert "raw:hash" in cache.client
+
+    t, m, cmap = cache.get_data_from_cache("hash")
+    numpy.testing.assert_array_equal(t, tile)
+    numpy.testing.assert_array_equal(m, mask)
+    assert cmap == {1: (0, 0, 0, 255)}
+    # arrays can be modified in place by post-processing
+    t[0] = 0
@@ -0,0 +1,15 @@
+"""Test titiler.ressources.responses."""
+
+from titiler.ressources.responses import TileResponse
+
+
+def test_tile_response():
+    """Should set image headers without changing the given ones."""
+    headers = {"X-Cache": "HIT"}
+    response = TileResponse(b"image", media_type="image/png", headers=headers)
+    assert response.body == b"image"
+    assert response.headers["content-length"] == "5"
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"] == "max-age=3600"
+    assert response.headers["x-cache"] == "HIT"
+    assert headers == {"X-Cache": "HIT"}
@@ -0,0 +1,86 @@
+"""Test titiler.api.utils."""
+
+from io import BytesIO
+
+import numpy
+import pytest
+
+from titiler.api import utils
+
+
+def test_postprocess_rescale(monkeypatch):
+    """Numba and NumPy rescale should return the same values."""
+    pytest.importorskip("numba")
+
+    tile = numpy.random.randint(0, 4000, size=(2, 256, 256)).astype(numpy.uint16)
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+    mask[0:10] = 0
+
+    arr = utils.postprocess(tile.copy(), mask, rescale="0,1000,10,3000")
+    assert arr.dtype == numpy.uint8
+    assert not arr[:, 0:10].any()
+
+    monkeypatch.setattr(utils, "utils_numba", None)
+    data = tile.copy()
+    ref = utils.postprocess(data, mask, rescale="0,1000,10,3000")
+    numpy.testing.assert_array_equal(arr, ref)
+    # input data is not modified
+    numpy.testing.assert_array_equal(data, tile)
+
+
+def test_apply_colormap(monkeypatch):
+    """Numba and rio-tiler colormap should return the same values."""
+    pytest.importorskip("numba")
+    from rio_tiler.colormap import cmap
+
+    colormap = cmap.get("viridis")
+    tile = numpy.random.randint(0, 256, size=(1, 256, 256)).astype(numpy.uint8)
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+    mask[0:10] = 0
+
+    data, alpha = utils.apply_colormap(tile, mask, colormap)
+    assert data.shape == (3, 256, 256)
+    assert not alpha[0:10].any()
+
+    monkeypatch.setattr(utils, "utils_numba", None)
+    ref_data, ref_alpha = utils.apply_colormap(tile, mask, colormap)
+    numpy.testing.assert_array_equal(data, ref_data)
+    numpy.testing.assert_array_equal(alpha, ref_alpha)
+
+
+def test_is_full_mask():
+    """Should detect masked pixels."""
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+    assert utils.is_full_mask(mask)
+
+    mask[100, 100] = 0
+    assert not utils.is_full_mask(mask)
+
+    # non-contiguous arrays fall back to numpy.all
+    assert not utils.is_full_mask(mask[::2, ::2])
+    assert utils.is_full_mask(numpy.full((3, 3), 255, dtype=numpy.uint8))
+
+
+def test_get_hash():
+    """Hash should depend on arguments values and order."""
+    assert utils.get_hash("a", 1, None) == utils.get_hash("a", 1, None)
+    assert utils.get_hash("a", 1, None) != utils.get_hash(1, "a", None)
+    assert utils.get_hash("a", (1, 2), {1: [0, 0, 0, 255]}) != utils.get_hash(
+        "a", (1, 2), {1: [0, 0, 0, 0]}
+    )
+
+
+def test_npy_bytes():
+    """Should match numpy.save output."""
+    tile = numpy.random.randint(0, 4000, size=(3, 256, 256)).astype(numpy.uint16)
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+
+    with BytesIO() as sio:
+        numpy.save(sio, numpy.concatenate([tile, mask[numpy.newaxis]]))
+        assert utils.npy_bytes(tile, mask) == sio.getvalue()
+
+    # int8 data is upcast so mask values are not wrapped
+    tile = numpy.zeros((1, 256, 256), dtype=numpy.int8)
+    data = numpy.load(BytesIO(utils.npy_bytes(tile, mask)))
+    assert data.dtype == numpy.int16
+    assert (data[1] == 255).all()
@@ -10,7 +10,8 @@ from starlette.templating import Jinja2Templates
 from rio_tiler_crs import COGReader
 
 from titiler.core import config
-from titiler.api.deps import TileMatrixSetNames, morecantile
+from titiler.api import utils
+from titiler.api.deps import TileMatrixSetNames
 from titiler.ressources.enums import ImageType, ImageMimeTypes, MimeTypes
 from titiler.ressources.responses import XMLResponse
 
@@ -47,7 +48,7 @@ def wtms(
     kwargs.pop("tile_scale", None)
     qs = urlencode(list(kwargs.items()))
 
-    tms = morecantile.tms.get(TileMatrixSetId.name)
+    tms = utils.get_tms(TileMatrixSetId.name)
     with COGReader(url, tms=tms) as cog:
         minzoom, maxzoom, bounds = cog.minzoom, cog.maxzoom, cog.bounds
 
@@ -1,23 +1,29 @@
 """API tiles."""
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
-import os
-from io import BytesIO
-from urllib.parse import urlencode
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from functools import lru_cache
+from urllib.parse import quote_plus
 
 import numpy
 
 from fastapi import APIRouter, Depends, Query, Path
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-from starlette.responses import Response
 
 from morecantile.models import TileMatrixSet
 
-from rasterio.transform import from_bounds
+from affine import Affine
+from rasterio.warp import transform
 from rio_tiler_crs import COGReader
-from rio_tiler.utils import render
 from rio_tiler.profiles import img_profiles
+from rio_tiler.utils import has_alpha_band, has_mask_band
 
 from titiler.api import utils
 from titiler.api.deps import CommonImageParams, TileMatrixSetNames, morecantile
@@ -49,6 +55,312 @@ params: Dict[str, Any] = {
 }
 
 
+# ImageType -> (GDAL driver, creation options, media type)
+_ext_dispatch: Dict[ImageType, Tuple[str, Dict, str]] = {
+    ext: (
+        drivers.get(ext.value, ""),
+        img_profiles.get(drivers.get(ext.value, "").lower(), {}),
+        ImageMimeTypes[ext.value].value,
+    )
+    for ext in ImageType
+}
+
+# Timers are replaced by a no-op when X-Server-Timings is disabled
+_timer: Type[utils.Timer] = utils.Timer if config.TIMINGS_ENABLED else utils.NullTimer
+
+# TileJSON fields with a default value (tilejson, version, scheme)
+_tilejson_defaults = {
+    name: field.default
+    for name, field in TileJSON.__fields__.items()
+    if name in ("tilejson", "version", "scheme")
+}
+
+# Query parameters not forwarded to the tile url
+_tilejson_skip_params = {"tile_format", "tile_scale", "TileMatrixSetId"}
+
+# Characters that change how a query string value is parsed. `;` is a
+# separator for parse_qsl before Python 3.7.10, `+` and `%` are decoded.
+_unsafe_chars = re.compile(r"[&=?# ;+%]")
+
+
+def _quote(value: str) -> str:
+    """URL encode value only if it contains reserved characters."""
+    return quote_plus(value) if _unsafe_chars.search(value) else value
+
+
+@lru_cache(maxsize=64)
+def _tile_grid(identifier: str, z: int) -> Tuple[float, float, float, float]:
+    """Top-left corner, width and height of the tiles of a TMS zoom level."""
+    bounds = utils.get_tms(identifier).xy_bounds(0, 0, z)
+    return (
+        bounds.xmin,
+        bounds.ymax,
+        bounds.xmax - bounds.xmin,
+        bounds.ymax - bounds.ymin,
+    )
+
+
+@lru_cache(maxsize=64)
+def _tile_resolution(identifier: str, z: int, tilesize: int) -> Tuple[float, float]:
+    """Output pixel size for a TMS zoom level, shared by all tiles of the level."""
+    _, _, width, height = _tile_grid(identifier, z)
+    return width / tilesize, height / tilesize
+
+
+# Bounds as (xmin, ymin, xmax, ymax)
+_Bounds = Tuple[float, float, float, float]
+
+# (COGReader, ExitStack closing it, expiry time, opaque bounds in the TMS CRS)
+_PooledReader = Tuple[COGReader, ExitStack, float, Optional[_Bounds]]
+
+
+def _opaque_bounds(cog: COGReader, densify_pts: int = 21) -> Optional[_Bounds]:
+    """
+    Get a box, in the TMS CRS, where reading the COG returns no masked pixel.
+
+    Edges of the COG are reprojected and the box is the one inscribed in
+    them, so it stays inside the COG footprint. Returns None when the COG
+    has nodata, an alpha or mask band, or a rotated geotransform.
+
+    """
+    src_dst = cog.dataset
+    if src_dst.nodata is not None or has_alpha_band(src_dst) or has_mask_band(src_dst):
+        return None
+
+    if not src_dst.transform.is_rectilinear:
+        return None
+
+    left, bottom, right, top = src_dst.bounds
+    xs = numpy.linspace(left, right, densify_pts)
+    ys = numpy.linspace(bottom, top, densify_pts)
+    lefts, rights = numpy.full_like(ys, left), numpy.full_like(ys, right)
+    bottoms, tops = numpy.full_like(xs, bottom), numpy.full_like(xs, top)
+
+    # left, right, bottom and top edges
+    x, y = transform(
+        src_dst.crs,
+        cog.tms.crs,
+        numpy.concatenate([lefts, rights, xs, xs]),
+        numpy.concatenate([ys, ys, bottoms, tops]),
+    )
+    x = numpy.array(x).reshape(4, densify_pts)
+    y = numpy.array(y).reshape(4, densify_pts)
+    xmin, ymin, xmax, ymax = x[0].max(), y[2].max(), x[1].min(), y[3].min()
+    if not (xmin < xmax and ymin < ymax):
+        return None
+
+    return float(xmin), float(ymin), float(xmax), float(ymax)
+
+
+class _ReaderPool(object):
+    """
+    Pool of idle COGReaders, checked out by one thread at a time.
+
+    Several readers can be open for the same COG so its tiles are read
+    concurrently. Readers are only closed while idle, outside the pool lock,
+    when they expire or the pool holds more than `maxsize` of them.
+
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        """Create an empty pool."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (url, TileMatrixSet identifier) -> idle readers, least recently used first
+        self._idle: "OrderedDict[Tuple[str, str], List[_PooledReader]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        """Number of idle readers."""
+        with self._lock:
+            return sum(map(len, self._idle.values()))
+
+    def checkout(self, url: str, tms: TileMatrixSet) -> _PooledReader:
+        """Get an idle reader for a COG, opening a new one if none is available."""
+        key = (url, tms.identifier)
+        now = time.monotonic()
+        entry = None
+        expired = []
+        with self._lock:
+            readers = self._idle.get(key, [])
+            while readers and entry is None:
+                candidate = readers.pop()
+                if candidate[2] > now:
+                    entry = candidate
+                else:
+                    expired.append(candidate)
+            if not readers:
+                self._idle.pop(key, None)
+
+        self._close(expired)
+        if entry is None:
+            stack = ExitStack()
+            cog = stack.enter_context(COGReader(url, tms=tms))
+            entry = (cog, stack, now + self.ttl, _opaque_bounds(cog))
+
+        return entry
+
+    def checkin(self, url: str, tms: TileMatrixSet, entry: _PooledReader) -> None:
+        """Return a reader to the pool, closing the least recently used ones."""
+        if entry[2] <= time.monotonic():
+            self._close([entry])
+            return
+
+        key = (url, tms.identifier)
+        evicted = []
+        with self._lock:
+            self._idle.setdefault(key, []).append(entry)
+            self._idle.move_to_end(key)
+            count = sum(map(len, self._idle.values()))
+            while count > self.maxsize:
+                oldest, readers = next(iter(self._idle.items()))
+                evicted.append(readers.pop(0))
+                if not readers:
+                    del self._idle[oldest]
+                count -= 1
+
+        self._close(evicted)
+
+    def clear(self) -> None:
+        """Close all idle readers."""
+        with self._lock:
+            evicted = [entry for readers in self._idle.values() for entry in readers]
+            self._idle.clear()
+
+        self._close(evicted)
+
+    @staticmethod
+    def _close(entries: List[_PooledReader]) -> None:
+        """Close readers, which must not be checked out."""
+        for entry in entries:
+            entry[1].close()
+
+
+_cog_pool = _ReaderPool(maxsize=config.COG_POOL_SIZE, ttl=config.COG_POOL_TTL)
+
+
+def _is_interior_tile(
+    opaque_bounds: Optional[_Bounds], tms: TileMatrixSet, x: int, y: int, z: int
+) -> bool:
+    """Check if a tile is inside the opaque bounds of a COG."""
+    if opaque_bounds is None:
+        return False
+
+    # Same as tms.xy_bounds(x, y, z), without its per call overhead
+    xorigin, yorigin, width, height = _tile_grid(tms.identifier, z)
+    left, top = xorigin + x * width, yorigin - y * height
+    xmin, ymin, xmax, ymax = opaque_bounds
+    return xmin <= left and left + width <= xmax and ymin <= top - height and top <= ymax
+
+
+def _read_tile(
+    url: str,
+    tms: TileMatrixSet,
+    x: int,
+    y: int,
+    z: int,
+    nodata: Optional[Union[float, int]] = None,
+    **kwargs: Any,
+) -> Tuple[numpy.ndarray, numpy.ndarray, Dict, bool]:
+    """
+    Read tile data, mask and internal colormap from a COG.
+
+    The last value tells if the mask is known to be full without scanning it.
+
+    """
+    # GDAL datasets are not thread-safe, each thread reads with its own reader
+    entry = _cog_pool.checkout(url, tms)
+    try:
+        cog, _, _, opaque_bounds = entry
+        tile, mask = cog.tile(x, y, z, nodata=nodata, **kwargs)
+        full_mask = nodata is None and _is_interior_tile(opaque_bounds, tms, x, y, z)
+        return tile, mask, cog.colormap, full_mask
+    finally:
+        _cog_pool.checkin(url, tms, entry)
+
+
+def _read_cog_metadata(url: str, tms: TileMatrixSet) -> Tuple:
+    """Read COG bounds, center, min/max zoom and internal colormap."""
+    with COGReader(url, tms=tms) as cog:
+        return cog.bounds, cog.center, cog.minzoom, cog.maxzoom, cog.colormap
+
+
+async def _get_tile_data(
+    url: str,
+    tms: TileMatrixSet,
+    x: int,
+    y: int,
+    z: int,
+    tilesize: int,
+    image_params: CommonImageParams,
+    cache_client: Optional[CacheLayer] = None,
+) -> Tuple[numpy.ndarray, numpy.ndarray, Dict, bool]:
+    """Get tile data from the raw cache layer or read it from the COG."""
+    data_hash = utils.get_hash(
+        tms.identifier,
+        z,
+        x,
+        y,
+        tilesize,
+        url,
+        image_params.indexes,
+        image_params.expression,
+        image_params.nodata,
+    )
+
+    if cache_client:
+        try:
+            tile, mask, cog_colormap = cache_client.get_data_from_cache(data_hash)
+            return tile, mask, cog_colormap, False
+        except Exception:
+            pass
+
+    tile, mask, cog_colormap, full_mask = await run_in_threadpool(
+        _read_tile,
+        url,
+        tms,
+        x,
+        y,
+        z,
+        tilesize=tilesize,
+        indexes=image_params.indexes,
+        expression=image_params.expression,
+        nodata=image_params.nodata,
+    )
+    if cache_client:
+        cache_client.set_data_cache(data_hash, (tile, mask, cog_colormap))
+
+    return tile, mask, cog_colormap, full_mask
+
+
+def _encode_tile(
+    tile: numpy.ndarray,
+    mask: numpy.ndarray,
+    ext: ImageType,
+    tms: TileMatrixSet,
+    x: int,
+    y: int,
+    z: int,
+    colormap: Optional[Dict] = None,
+) -> bytes:
+    """Encode tile data and mask to the requested output type."""
+    if ext == ImageType.npy:
+        return utils.npy_bytes(tile, mask)
+
+    driver, options, _ = _ext_dispatch[ext]
+    if ext == ImageType.tif:
+        tilesize = tile.shape[-1]
+        bounds = tms.xy_bounds(x, y, z)
+        xres, yres = _tile_resolution(tms.identifier, z, tilesize)
+        dst_transform = Affine(xres, 0, bounds.xmin, 0, -yres, bounds.ymax)
+        options = {"crs": tms.crs, "transform": dst_transform}
+
+    if colormap:
+        tile, mask = utils.apply_colormap(tile, mask, colormap)
+
+    return utils.render(tile, mask, img_format=driver, **options)
+
+
 @router.get(r"/cog/tiles/{z}/{x}/{y}", **params)
 @router.get(r"/cog/tiles/{z}/{x}/{y}\.{ext}", **params)
 @router.get(r"/cog/tiles/{z}/{x}/{y}@{scale}x", **params)
@@ -74,27 +386,26 @@ async def tile(
     cache_client: CacheLayer = Depends(utils.get_cache),
 ) -> TileResponse:
     """Handle /tiles requests."""
-    timings = []
+    timings: List[Tuple[str, float]] = []
     headers: Dict[str, str] = {}
 
     tile_hash = utils.get_hash(
-        **dict(
-            identifier=TileMatrixSetId.name,
-            z=z,
-            x=x,
-            y=y,
-            ext=ext,
-            scale=scale,
-            url=url,
-            indexes=image_params.indexes,
-            nodata=image_params.nodata,
-            rescale=image_params.rescale,
-            color_formula=image_params.color_formula,
-            color_map=image_params.color_map,
-        )
+        TileMatrixSetId.name,
+        z,
+        x,
+        y,
+        ext,
+        scale,
+        url,
+        image_params.indexes,
+        image_params.expression,
+        image_params.nodata,
+        image_params.rescale,
+        image_params.color_formula,
+        image_params.color_map,
     )
     tilesize = scale * 256
-    tms = morecantile.tms.get(TileMatrixSetId.name)
+    tms = utils.get_tms(TileMatrixSetId.name)
 
     content = None
     if cache_client:
@@ -105,79 +416,58 @@ async def tile(
             content = None
 
     if not content:
-        with utils.Timer() as t:
-            with COGReader(url, tms=tms) as cog:
-                tile, mask = cog.tile(
-                    x,
-                    y,
-                    z,
-                    tilesize=tilesize,
-                    indexes=image_params.indexes,
-                    expression=image_params.expression,
-                    nodata=image_params.nodata,
-                )
-                colormap = image_params.color_map or cog.colormap
-
+        with _timer() as t:
+            tile, mask, cog_colormap, full_mask = await _get_tile_data(
+                url, tms, x, y, z, tilesize, image_params, cache_client
+            )
+            colormap = image_params.color_map or cog_colormap
         timings.append(("Read", t.elapsed))
 
         if not ext:
-            ext = ImageType.jpg if mask.all() else ImageType.png
-
-        with utils.Timer() as t:
-            tile = utils.postprocess(
-                tile,
-                mask,
-                rescale=image_params.rescale,
-                color_formula=image_params.color_formula,
-            )
-        timings.append(("Post-process", t.elapsed))
-
-        with utils.Timer() as t:
-            if ext == ImageType.npy:
-                sio = BytesIO()
-                numpy.save(sio, (tile, mask))
-                sio.seek(0)
-                content = sio.getvalue()
-            else:
-                driver = drivers[ext.value]
-                options = img_profiles.get(driver.lower(), {})
-                if ext == ImageType.tif:
-                    bounds = tms.xy_bounds(x, y, z)
-                    dst_transform = from_bounds(*bounds, tilesize, tilesize)
-                    options = {"crs": tms.crs, "transform": dst_transform}
-                content = render(
-                    tile, mask, img_format=driver, colormap=colormap, **options
+            full_mask = full_mask or utils.is_full_mask(mask)
+            ext = ImageType.jpg if full_mask else ImageType.png
+
+        if image_params.rescale or image_params.color_formula:
+            with _timer() as t:
+                tile = utils.postprocess(
+                    tile,
+                    mask,
+                    rescale=image_params.rescale,
+                    color_formula=image_params.color_formula,
                 )
+            timings.append(("Post-process", t.elapsed))
+        else:
+            timings.append(("Post-process", 0))
+
+        with _timer() as t:
+            content = _encode_tile(tile, mask, ext, tms, x, y, z, colormap=colormap)
         timings.append(("Format", t.elapsed))
 
         if cache_client and content:
             cache_client.set_image_cache(tile_hash, (content, ext))
 
-    if timings:
+    if config.TIMINGS_ENABLED and timings:
         headers["X-Server-Timings"] = "; ".join(
             ["{} - {:0.2f}".format(name, time * 1000) for (name, time) in timings]
         )
 
-    return TileResponse(
-        content, media_type=ImageMimeTypes[ext.value].value, headers=headers,
-    )
+    return TileResponse(content, media_type=_ext_dispatch[ext][2], headers=headers)
 
 
 @router.get(
     "/cog/tilejson.json",
     response_model=TileJSON,
+    response_class=ORJSONResponse,
     responses={200: {"description": "Return a tilejson"}},
-    response_model_exclude_none=True,
 )
 @router.get(
     "/cog/{TileMatrixSetId}/tilejson.json",
     response_model=TileJSON,
+    response_class=ORJSONResponse,
     responses={200: {"description": "Return a tilejson"}},
-    response_model_exclude_none=True,
 )
 async def tilejson(
     request: Request,
-    response: Response,
     TileMatrixSetId: TileMatrixSetNames = Query(
         TileMatrixSetNames.WebMercatorQuad,  # type: ignore
         description="TileMatrixSet Name (default: 'WebMercatorQuad')",
@@ -196,30 +486,41 @@ async def tilejson(
     if config.API_VERSION_STR:
         host += config.API_VERSION_STR
 
-    kwargs = dict(request.query_params)
-    kwargs.pop("tile_format", None)
-    kwargs.pop("tile_scale", None)
-    kwargs.pop("TileMatrixSetId", None)
-
-    qs = urlencode(list(kwargs.items()))
+    qs = "&".join(
+        f"{_quote(key)}={_quote(value)}"
+        for key, value in request.query_params.multi_items()
+        if key not in _tilejson_skip_params
+    )
     if tile_format:
         tile_url = f"{scheme}://{host}/cog/tiles/{TileMatrixSetId.name}/{{z}}/{{x}}/{{y}}@{tile_scale}x.{tile_format}?{qs}"
     else:
         tile_url = f"{scheme}://{host}/cog/tiles/{TileMatrixSetId.name}/{{z}}/{{x}}/{{y}}@{tile_scale}x?{qs}"
 
-    tms = morecantile.tms.get(TileMatrixSetId.name)
-    with COGReader(url, tms=tms) as cog:
+    # The tile url holds the COG url, TMS and every forwarded parameter
+    tjson = utils.tilejson_cache.get(tile_url)
+    if tjson is None:
+        cache_key = (url, TileMatrixSetId.name)
+        cog_metadata = utils.cog_metadata_cache.get(cache_key)
+        if cog_metadata is None:
+            tms = utils.get_tms(TileMatrixSetId.name)
+            cog_metadata = await run_in_threadpool(_read_cog_metadata, url, tms)
+            utils.cog_metadata_cache[cache_key] = cog_metadata
+
+        bounds, center, minzoom, maxzoom, _ = cog_metadata
         tjson = {
-            "bounds": cog.bounds,
-            "center": cog.center,
-            "minzoom": cog.minzoom,
-            "maxzoom": cog.maxzoom,
-            "name": os.path.basename(url),
+            **_tilejson_defaults,
+            "bounds": bounds,
+            "center": center,
+            "minzoom": minzoom,
+            "maxzoom": maxzoom,
+            "name": url.rpartition("/")[2] or url,
             "tiles": [tile_url],
         }
+        utils.tilejson_cache[tile_url] = tjson
 
-    response.headers["Cache-Control"] = "max-age=3600"
-    return tjson
+    # The document is built from trusted values, so skip the response_model
+    # validation and serialize it with orjson.
+    return ORJSONResponse(tjson, headers={"Cache-Control": "max-age=3600"})
 
 
 @router.get(
@@ -243,7 +544,7 @@ async def tmslis(request: Request):
         "tileMatrixSets": [
             {
                 "id": tms,
-                "title": morecantile.tms.get(tms).title,
+                "title": utils.get_tms(tms).title,
                 "links": [
                     {
                         "href": f"{scheme}://{host}/tileMatrixSets/{tms}",
@@ -266,5 +567,5 @@ async def tmsinfo(
     TileMatrixSetId: TileMatrixSetNames = Query(..., description="TileMatrixSet Name")
 ):
     """Handle /tileMatrixSets/identifier requests."""
-    tms = morecantile.tms.get(TileMatrixSetId.name)
+    tms = utils.get_tms(TileMatrixSetId.name)
     return tms.dict()
@@ -1,30 +1,59 @@
 """titiler.api.utils."""
 
-from typing import Any, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import time
-import json
-import hashlib
+from functools import lru_cache
+from io import BytesIO
 
+import msgpack
 import numpy
+import xxhash
+from cachetools import TTLCache
 
 from starlette.requests import Request
 
+from morecantile.models import TileMatrixSet
+
+from rasterio.io import MemoryFile
 from rio_color.operations import parse_operations
 from rio_color.utils import scale_dtype, to_math_type
+from rio_tiler.colormap import apply_cmap, make_lut
 from rio_tiler.utils import linear_rescale, _chunks
 
+from titiler.api.deps import morecantile
 from titiler.db.memcache import CacheLayer
 
+try:
+    from titiler.api import utils_numba
+except Exception:  # numba is not installed or the kernels failed to compile
+    utils_numba = None  # type: ignore
+
+_parse_color_formula = lru_cache(maxsize=128)(parse_operations)
+
+# (url, TileMatrixSet identifier) -> (bounds, center, minzoom, maxzoom, colormap)
+cog_metadata_cache: TTLCache = TTLCache(maxsize=512, ttl=300)
+
+# tile url -> TileJSON document
+tilejson_cache: TTLCache = TTLCache(maxsize=512, ttl=60)
+
+_full_mask_word = numpy.uint64(0xFFFFFFFFFFFFFFFF)
+
 
 def get_cache(request: Request) -> CacheLayer:
     """Get Memcached Layer."""
     return request.state.cache
 
 
-def get_hash(**kwargs: Any) -> str:
-    """Create hash from a dict."""
-    return hashlib.sha224(json.dumps(kwargs, sort_keys=True).encode()).hexdigest()
+@lru_cache(maxsize=32)
+def get_tms(identifier: str) -> TileMatrixSet:
+    """Get TileMatrixSet from its identifier."""
+    return morecantile.tms.get(identifier)
+
+
+def get_hash(*args: Any) -> str:
+    """Create hash from positional arguments."""
+    return xxhash.xxh3_128(msgpack.packb(args, use_bin_type=True)).hexdigest()
 
 
 def postprocess(
@@ -40,26 +69,125 @@ def postprocess(
         if len(rescale_arr) != tile.shape[0]:
             rescale_arr = ((rescale_arr[0]),) * tile.shape[0]
 
-        for bdx in range(tile.shape[0]):
-            tile[bdx] = numpy.where(
-                mask,
-                linear_rescale(
-                    tile[bdx], in_range=rescale_arr[bdx], out_range=[0, 255]
-                ),
-                0,
-            )
-        tile = tile.astype(numpy.uint8)
+        if utils_numba is not None and tile.dtype.name in utils_numba.rescale_dtypes:
+            imin, imax = numpy.array(rescale_arr, dtype=numpy.float64).T
+            tile = utils_numba.linear_rescale(
+                tile.reshape(tile.shape[0], -1), mask.reshape(-1), imin, imax
+            ).reshape(tile.shape)
+        else:
+            # write each rescaled band straight into the uint8 output instead
+            # of going through the source dtype
+            data = numpy.empty(tile.shape, dtype=numpy.uint8)
+            for bdx in range(tile.shape[0]):
+                data[bdx] = numpy.where(
+                    mask,
+                    linear_rescale(
+                        tile[bdx], in_range=rescale_arr[bdx], out_range=[0, 255]
+                    ),
+                    0,
+                )
+            tile = data
 
     if color_formula:
         # make sure one last time we don't have
         # negative value before applying color formula
         tile[tile < 0] = 0
-        for ops in parse_operations(color_formula):
+        for ops in _parse_color_formula(color_formula):
             tile = scale_dtype(ops(to_math_type(tile)), numpy.uint8)
 
     return tile
 
 
+def is_full_mask(mask: numpy.ndarray) -> bool:
+    """Check that no pixel is masked, comparing 8 mask bytes at a time."""
+    # partial tiles usually have a masked corner
+    if not (mask[0, 0] and mask[-1, -1]):
+        return False
+
+    if mask.dtype == numpy.uint8 and mask.flags.c_contiguous and mask.size % 8 == 0:
+        words = mask.reshape(-1).view(numpy.uint64)
+        return bool((words == _full_mask_word).all())
+
+    return bool(mask.all())
+
+
+def apply_colormap(
+    tile: numpy.ndarray, mask: numpy.ndarray, colormap: Dict
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Apply colormap on tile data and merge its alpha band with the mask."""
+    if utils_numba is not None and tile.shape[0] == 1 and tile.dtype == numpy.uint8:
+        data = utils_numba.apply_colormap(tile[0], make_lut(colormap))
+        tile, alpha = data[:-1], data[-1]
+    else:
+        tile, alpha = apply_cmap(tile, colormap)
+
+    return tile, numpy.bitwise_and(mask, alpha)
+
+
+def render(
+    tile: numpy.ndarray,
+    mask: Optional[numpy.ndarray] = None,
+    img_format: str = "PNG",
+    **creation_options: Any,
+) -> bytes:
+    """Encode tile data to an image using a GDAL MemoryFile."""
+    img_format = img_format.upper()
+
+    if tile.ndim < 3:
+        tile = tile[numpy.newaxis]
+
+    # WEBP doesn't support 1band dataset so we must hack to create a RGB dataset
+    if img_format == "WEBP" and tile.shape[0] == 1:
+        tile = numpy.repeat(tile, 3, axis=0)
+    elif img_format == "JPEG":
+        mask = None
+
+    count, height, width = tile.shape
+    output_profile = dict(
+        driver=img_format,
+        dtype=tile.dtype,
+        count=count + 1 if mask is not None else count,
+        height=height,
+        width=width,
+    )
+    output_profile.update(creation_options)
+
+    with MemoryFile() as memfile:
+        with memfile.open(**output_profile) as dst:
+            dst.write(tile, indexes=list(range(1, count + 1)))
+            # Use Mask as an alpha band
+            if mask is not None:
+                dst.write(mask.astype(tile.dtype, copy=False), indexes=count + 1)
+
+        return memfile.read()
+
+
+def npy_bytes(tile: numpy.ndarray, mask: numpy.ndarray) -> bytes:
+    """Serialize tile data and mask as one (count + 1, height, width) .npy array."""
+    count, height, width = tile.shape
+    # Same dtype as numpy.concatenate so mask values are never wrapped
+    dtype = numpy.result_type(tile.dtype, mask.dtype)
+    header = {
+        "descr": numpy.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": (count + 1, height, width),
+    }
+    with BytesIO() as sio:
+        numpy.lib.format.write_array_header_1_0(sio, header)
+        npy_header = sio.getvalue()
+
+    offset = len(npy_header)
+    buf = bytearray(offset + (count + 1) * height * width * dtype.itemsize)
+    buf[:offset] = npy_header
+
+    data = numpy.frombuffer(buf, dtype=dtype, offset=offset)
+    data = data.reshape(count + 1, height, width)
+    data[:count] = tile
+    data[count] = mask
+
+    return bytes(buf)
+
+
 # This code is copied from marblecutter
 #  https://github.com/mojodna/marblecutter/blob/master/marblecutter/stats.py
 # License:
@@ -80,3 +208,16 @@ class Timer(object):
         """Stops timer."""
         self.end = time.time()
         self.elapsed = self.end - self.start
+
+
+class NullTimer(Timer):
+    """No-op Timer, used when server timings are disabled."""
+
+    elapsed = 0.0
+
+    def __enter__(self):
+        """Do nothing."""
+        return self
+
+    def __exit__(self, ty, val, tb):
+        """Do nothing."""
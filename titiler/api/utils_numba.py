@@ -0,0 +1,48 @@
+"""
+titiler.api.utils_numba: numba accelerated post-processing.
+
+Kernels are compiled when this module is imported and cached on disk
+(in __pycache__ or NUMBA_CACHE_DIR) so other processes load them instead.
+
+"""
+
+import numpy
+from numba import guvectorize, njit, prange
+
+rescale_dtypes = ["uint8", "uint16", "int16", "uint32", "int32", "float32", "float64"]
+
+
+@guvectorize(
+    [f"void({dt}[:], uint8[:], float64, float64, uint8[:])" for dt in rescale_dtypes],
+    "(n),(n),(),()->(n)",
+    nopython=True,
+    target="parallel",
+    cache=True,
+)
+def linear_rescale(arr, mask, imin, imax, out):
+    """
+    Rescale data from in_range to [0, 255] and cast to uint8 in one pass.
+
+    Masked pixels are set to 0. Operations are done in the same order as
+    `rio_tiler.utils.linear_rescale` so both paths return the same values.
+
+    """
+    for i in range(arr.shape[0]):
+        if mask[i]:
+            value = min(max(arr[i], imin), imax) - imin
+            out[i] = value / (imax - imin) * 255.0
+        else:
+            out[i] = 0
+
+
+@njit("uint8[:, :, :](uint8[:, :], uint8[:, :])", parallel=True, cache=True)
+def apply_colormap(arr, lut):
+    """Apply a (256, 4) RGBA lookup table, returning a (4, height, width) array."""
+    height, width = arr.shape
+    out = numpy.empty((4, height, width), dtype=numpy.uint8)
+    for i in prange(height):
+        for j in range(width):
+            value = arr[i, j]
+            for c in range(4):
+                out[c, i, j] = lut[value, c]
+    return out
@@ -18,3 +18,15 @@ MEMCACHE_HOST = os.environ.get("MEMCACHE_HOST")
 MEMCACHE_PORT = int(os.environ.get("MEMCACHE_PORT", 11211))
 MEMCACHE_USERNAME = os.environ.get("MEMCACHE_USERNAME")
 MEMCACHE_PASSWORD = os.environ.get("MEMCACHE_PASSWORD")
+
+# Threads used to read COGs off the event loop
+MAX_THREADS = int(os.environ.get("MAX_THREADS", (os.cpu_count() or 1) * 4))
+
+# Number of COGs kept open between tile requests
+COG_POOL_SIZE = int(os.environ.get("COG_POOL_SIZE", 32))
+
+# Seconds before pooled COGs are reopened, matching the metadata cache
+COG_POOL_TTL = int(os.environ.get("COG_POOL_TTL", 300))
+
+# Add X-Server-Timings header to tile responses
+TIMINGS_ENABLED = bool(int(os.environ.get("TITILER_TIMINGS", 1)))
@@ -1,7 +1,9 @@
 """titiler.cache.memcache: memcached layer."""
 
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 
+import numpy
+import zstandard
 from bmemcached import Client
 
 from titiler.ressources.enums import ImageType
@@ -61,3 +63,68 @@ class CacheLayer(object):
             return self.client.set(img_hash, body, time=timeout)
         except Exception:
             return False
+
+    def get_data_from_cache(
+        self, data_hash: str
+    ) -> Tuple[numpy.ndarray, numpy.ndarray, Dict]:
+        """
+        Get raw tile data from cache layer.
+
+        Attributes
+        ----------
+            data_hash : str
+                tile data hash.
+
+        Returns
+        -------
+            tile : numpy.ndarray
+                tile data.
+            mask : numpy.ndarray
+                tile mask.
+            colormap : dict
+                COG internal colormap.
+
+        """
+        body, dtype, shape, colormap = self.client.get(f"raw:{data_hash}")
+        buf = bytearray(zstandard.ZstdDecompressor().decompress(body))
+        count, height, width = shape
+        tile = numpy.frombuffer(buf, dtype=dtype, count=count * height * width)
+        mask = numpy.frombuffer(buf, dtype=numpy.uint8, offset=tile.nbytes)
+        return tile.reshape(shape), mask.reshape(height, width), colormap
+
+    def set_data_cache(
+        self,
+        data_hash: str,
+        data: Tuple[numpy.ndarray, numpy.ndarray, Dict],
+        timeout: int = 432000,
+    ) -> bool:
+        """
+        Set zstd compressed raw tile data in cache layer.
+
+        Attributes
+        ----------
+            data_hash : str
+                tile data hash.
+            data : tuple
+                tile data + mask + colormap
+        Returns
+        -------
+            bool
+
+        """
+        tile, mask, colormap = data
+        try:
+            tile = numpy.ascontiguousarray(tile)
+            mask = numpy.ascontiguousarray(mask, dtype=numpy.uint8)
+            # Compress both buffers in one frame without concatenating them
+            cobj = zstandard.ZstdCompressor(level=1).compressobj(
+                size=tile.nbytes + mask.nbytes
+            )
+            body = cobj.compress(tile) + cobj.compress(mask) + cobj.flush()
+            return self.client.set(
+                f"raw:{data_hash}",
+                (body, tile.dtype.str, tile.shape, colormap),
+                time=timeout,
+            )
+        except Exception:
+            return False
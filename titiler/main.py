@@ -1,6 +1,9 @@
 """titiler app."""
 from typing import Any, Dict
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from fastapi import FastAPI
 from starlette.requests import Request
 from starlette.responses import HTMLResponse
@@ -51,6 +54,13 @@ if config.BACKEND_CORS_ORIGINS:
 app.add_middleware(GZipMiddleware, minimum_size=0)
 
 
+@app.on_event("startup")
+async def startup_event():
+    """Use a bounded thread pool for blocking COG reads."""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=config.MAX_THREADS))
+
+
 @app.middleware("http")
 async def cache_middleware(request: Request, call_next):
     """Add cache layer."""
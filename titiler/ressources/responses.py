@@ -1,5 +1,7 @@
 """Common response models."""
 
+from typing import Optional
+
 from starlette.responses import Response
 from starlette.background import BackgroundTask
 
@@ -18,16 +20,17 @@ class TileResponse(Response):
         content: bytes,
         media_type: str,
         status_code: int = 200,
-        headers: dict = {},
+        headers: Optional[dict] = None,
         background: BackgroundTask = None,
         ttl: int = 3600,
     ) -> None:
         """Init tiler response."""
+        headers = dict(headers or {})
+        self.body = self.render(content)
         headers.update({"Content-Type": media_type})
         if ttl:
             headers.update({"Cache-Control": "max-age=3600"})
-        self.body = self.render(content)
-        self.status_code = 200
+        self.status_code = status_code
         self.media_type = media_type
         self.background = background
         self.init_headers(headers)